@@ -8,24 +8,86 @@ Purpose: Connect to a remote device via SpectroServer.
 import socket
 import sys
 import logging
-import threading
 import argparse
-import ipaddress
+import re
 import os
-import requests
 import platform
-from lxml import etree
-from typing import List, Dict
+import selectors
+import functools
+import hashlib
+import pickle
+import tempfile
+import time
+from typing import List, Dict, Optional, TYPE_CHECKING
+from io import BytesIO
+from xml.sax.saxutils import escape as xml_escape
 from subprocess import Popen
 
+if TYPE_CHECKING:
+    import requests
+    from lxml import etree
+
 
 SPECTRUM_URL = os.getenv("SPECTRUM_URL")
 SPECTRUM_USERNAME = os.getenv("SPECTRUM_USERNAME")
 SPECTRUM_PASSWORD = os.getenv("SPECTRUM_PASSWORD")
 SPECTROSERVER_HOST = os.getenv("SPECTROSERVER_HOST")
-SPECTROSERVER_PORT = os.getenv("SPECTROSERVER_PORT", 31415)
+SPECTROSERVER_PORT = int(os.getenv("SPECTROSERVER_PORT", 31415))
 DEFAULT_PORTS = {"ssh": 22, "telnet": 23}
 TELNET_PLATFORMS = ["8519702"]
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spectro_connect")
+CACHE_TTL = 3600
+
+# Kernel relay (splice) settings
+
+SPLICE_SUPPORTED = platform.system() == "Linux" and hasattr(os, "splice")
+SPLICE_PIPE_SIZE = int(os.getenv("SPECTRO_PIPE_SIZE", 1 << 20))
+SOCKET_BUFFER_SIZE = int(os.getenv("SPECTRO_SOCKET_BUFFER_SIZE", 0))
+
+# Spectrum API session, created on first use and reused across requests to
+# keep connections alive
+
+_SESSION = None
+
+# XML payload that will instruct Spectrum to search devices and use the
+# filter provided i.e. devices with a model name that contains the given
+# hostname string (case ignored). The name is substituted in with `%`.
+
+_PAYLOAD_TMPL = b"""<?xml version="1.0" encoding="UTF-8"?>
+    <rs:model-request
+    xmlns:rs="http://www.ca.com/spectrum/restful/schema/request"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    throttlesize="60000"
+    xsi:schemaLocation="http://www.ca.com/spectrum/restful/schema/request
+    ../../../xsd/Request.xsd">
+        <rs:target-models>
+            <rs:models-search>
+                <rs:search-criteria
+                xmlns="http://www.ca.com/spectrum/restful/schema/filter">
+                    <devices-only-search>
+                    </devices-only-search>
+                    <filtered-models>
+                        <has-substring-ignore-case>
+                            <model-name>%b</model-name>
+                        </has-substring-ignore-case>
+                    </filtered-models>
+                </rs:search-criteria>
+            </rs:models-search>
+        </rs:target-models>
+        <rs:requested-attribute id="0x1006e" />  <!-- Model Name -->
+        <rs:requested-attribute id="0x12d7f" />  <!-- IP Address -->
+        <rs:requested-attribute id="0x12bef" />  <!-- NCM Device Family -->
+    </rs:model-request>
+    """
+
+RELAY_CMD_TMPL = b"relay %s %d\r\n"
+IPV4_RE = re.compile(r"(?:(?:0|[1-9][0-9]{0,2})\.){3}(?:0|[1-9][0-9]{0,2})")
+
+
+def _is_tty(stream) -> bool:
+    """Returns True if stream is an interactive terminal"""
+    return getattr(stream, "isatty", lambda: False)()
+
 
 # Colours
 
@@ -34,151 +96,296 @@ OKGREEN = "\033[92m"
 OKCYAN = "\033[96m"
 ENDC = "\033[0m"
 
+# Escape sequences are just noise when output is redirected or piped
+
+if not (_is_tty(sys.stdout) and _is_tty(sys.stderr)):
+    WARNING = OKGREEN = OKCYAN = ENDC = ""
+
+# Status messages
+
+CONNECTING_FMT = (
+    f"[+] Connecting to host [{OKCYAN}%s:%d{ENDC}] "
+    f"through SpectroServer [{OKCYAN}%s:%d{ENDC}]"
+)
+FOUND_FMT = f"[+] Found device {OKGREEN}%s{ENDC}"
+NOT_FOUND_FMT = f'{WARNING}Error: No device with name "%s" found{ENDC}'
+MULTIPLE_MATCHES_MSG = f"{WARNING}Mulitple device matches found:{ENDC}"
+NO_MATCHES_MSG = f"{WARNING}No matches found{ENDC}"
+
 
 def is_ipv4(string: str) -> bool:
     """Returns True if string is a valid IPv4 address"""
-    try:
-        ipaddress.ip_address(string)
-        return True
-    except ValueError:
-        return False
+    return bool(IPV4_RE.fullmatch(string)) and _valid_octets(string)
+
+
+def _get_session() -> "requests.Session":
+    """Return the shared Spectrum API session, creating it if needed"""
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=2, backoff_factor=0.2),
+        )
+        _SESSION = requests.Session()
+        _SESSION.auth = (SPECTRUM_USERNAME, SPECTRUM_PASSWORD)
+        _SESSION.headers.update(
+            {"Content-Type": "application/xml", "Connection": "keep-alive"}
+        )
+        _SESSION.mount("https://", adapter)
+        _SESSION.mount("http://", adapter)
+    return _SESSION
 
 
-def strip_ns(root: etree.Element) -> etree.Element:
+def disk_cache(func):
     """
-    This function removes all namespace information from an XML Element tree
-    so that a Caller can then use the `xpath` function without having
-    to deal with the complexities of namespaces.
+    Cache the devices returned by a Spectrum lookup on disk, keyed by the
+    Spectrum URL and search name, so repeated lookups within `CACHE_TTL`
+    seconds skip the API request. Pass `use_cache=False` to bypass the cache
+    or `refresh=True` to ignore and replace any cached result.
     """
 
-    # first we visit each node in the tree and set the tag name to its
-    # localname value; thus removing its namespace prefix
+    @functools.wraps(func)
+    def wrapper(name: str, use_cache: bool = True, refresh: bool = False):
+        if not use_cache:
+            return func(name)
+
+        key = hashlib.sha256(f"{SPECTRUM_URL}\0{name}".encode()).hexdigest()
+        cache_file = os.path.join(CACHE_DIR, f"{key}.pickle")
+
+        if not refresh:
+            devices = _read_cache(cache_file)
+            if devices is not None:
+                logging.debug("[+] Using cached results for [%s]", name)
+                return devices
+
+        devices = func(name)
 
-    for elem in root.getiterator():
-        elem.tag = etree.QName(elem).localname
+        # Only cache successful lookups, so newly added devices are found
 
-    # at this point there are no tags with namespaces, so we run the cleanup
-    # process to remove the namespace definitions from within the tree.
+        if devices:
+            _write_cache(cache_file, devices)
+        return devices
 
-    etree.cleanup_namespaces(root)
-    return root
+    return wrapper
+
+
+def _read_cache(cache_file: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Return the devices stored in a cache file, or None if the file is
+    missing, expired or unreadable
+    """
+    try:
+        with open(cache_file, "rb") as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+    if not (
+        isinstance(entry, tuple)
+        and len(entry) == 2
+        and isinstance(entry[0], (int, float))
+        and isinstance(entry[1], dict)
+    ):
+        return None
+    timestamp, devices = entry
+    if time.time() - timestamp >= CACHE_TTL:
+        return None
+    return devices
+
+
+def _write_cache(cache_file: str, devices: Dict[str, Dict[str, str]]) -> None:
+    """
+    Store devices in a cache file. The data is written to a temporary file
+    first and moved into place, so concurrent runs never see a partial file.
+    """
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((time.time(), devices), f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
 
 
+@disk_cache
 def spectrum_device_search_by_name(name: str) -> List[Dict[str, str]]:
     """
     Search for devices which match the given hostname and return the hostnames
     and Spectrum model handles
     """
 
+    # Import the XML parser here rather than at module level, as it is only
+    # needed when a Spectrum lookup is performed
+
+    from lxml import etree
+
     # Construct the necesary API components to make an API request to Spectrum
 
     url = f"{SPECTRUM_URL}/spectrum/restful/models"
-    headers = {"Content-Type": "application/xml"}
-    auth = (SPECTRUM_USERNAME, SPECTRUM_PASSWORD)
 
-    # XML payload that will instruct Spectrum to search devices and use the
-    # filter provided i.e. devices with a model name that contains the given
-    # hostname string (case ignored).
+    # Escape the name so it cannot alter the structure of the XML payload
 
-    payload = f"""<?xml version="1.0" encoding="UTF-8"?>
-    <rs:model-request
-    xmlns:rs="http://www.ca.com/spectrum/restful/schema/request"
-    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
-    throttlesize="60000"
-    xsi:schemaLocation="http://www.ca.com/spectrum/restful/schema/request
-    ../../../xsd/Request.xsd">
-        <rs:target-models>
-            <rs:models-search>
-                <rs:search-criteria
-                xmlns="http://www.ca.com/spectrum/restful/schema/filter">
-                    <devices-only-search>
-                    </devices-only-search>
-                    <filtered-models>
-                        <has-substring-ignore-case>
-                            <model-name>{name}</model-name>
-                        </has-substring-ignore-case>
-                    </filtered-models>
-                </rs:search-criteria>
-            </rs:models-search>
-        </rs:target-models>
-        <rs:requested-attribute id="0x1006e" />  <!-- Model Name -->
-        <rs:requested-attribute id="0x12d7f" />  <!-- IP Address -->
-        <rs:requested-attribute id="0x12bef" />  <!-- NCM Device Family -->
-    </rs:model-request>
-    """
+    payload = _PAYLOAD_TMPL % xml_escape(name).encode("utf-8")
 
     # Send the POST request to Spectrum OC
 
-    resp = requests.post(url=url, headers=headers, auth=auth, data=payload)
+    resp = _get_session().post(url=url, data=payload)
 
     # Raise exception if HTTP error occurred
 
     resp.raise_for_status()
 
-    # Parse the XML and strip namespace
-
-    root = etree.fromstring(resp.content)
-    root = strip_ns(root)
+    # Parse the XML incrementally. If any devices are found, these will appear
+    # in the 'model' element nodes (in any namespace). Each model is parsed
+    # and added to the 'devices' dict, which is then returned. Processed
+    # elements are discarded to keep memory usage flat.
+
+    devices = {}
+    context = etree.iterparse(
+        BytesIO(resp.content),
+        events=("end",),
+        tag="{*}model",
+        huge_tree=True,
+    )
+    for _, model in context:
+        device = _parse_model(model)
+        devices[device["name"]] = device
+        model.clear()
+        while model.getprevious() is not None:
+            del model.getparent()[0]
 
-    # If any devices are found, these will appear in the 'model' element nodes
-    # We first check if there are any at all, then loop through the results
-    # and append each one to the 'devices' list, which is then returned.
+    return devices
 
-    etmodels = root.findall(".//model")
-    # print(etree.tostring(etmodels, pretty_print=True).decode())
 
-    devices = {
-        model.find("attribute[@id='0x1006e']").text: {
-            "name": model.find("attribute[@id='0x1006e']").text,
-            "ip_addr": model.find("attribute[@id='0x12d7f']").text,
-            "pfm": model.find("attribute[@id='0x12bef']").text,
-        }
-        for model in etmodels
-    }
+def _parse_model(model: "etree._Element") -> Dict[str, str]:
+    """Extract the device details from a Spectrum model element"""
+    name = ip_addr = pfm = None
+    for attr in model:
+        attr_id = attr.get("id")
+        if attr_id == "0x1006e":
+            name = attr.text
+        elif attr_id == "0x12d7f":
+            ip_addr = attr.text
+        elif attr_id == "0x12bef":
+            pfm = attr.text
+    return {"name": name, "ip_addr": ip_addr, "pfm": pfm}
 
-    return devices
 
-
-def transfer(src: socket.socket, dst: socket.socket, send: bool) -> None:
+def transfer(
+    src: socket.socket, dst: socket.socket, buffer: memoryview
+) -> bool:
     """
-    Send data received on the source socket to the destination socket.
+    Send data waiting on the source socket to the destination socket, using
+    the given buffer. Returns False once the source socket has been closed.
     """
-    src_addr, src_port = src.getsockname()
-    dst_addr, dst_port = dst.getsockname()
-    while True:
-        try:
-            buffer = src.recv(0x400)
-        except socket.error:
-            break
-        if len(buffer) == 0:
-            logging.debug("[-] No data received! Breaking...")
-            break
-        try:
-            dst.send(buffer)
-        except socket.error:
-            break
-    logging.debug(f"[+] Closing connections! [{src_addr}:{src_port}]")
     try:
-        src.shutdown(socket.SHUT_RDWR)
-        src.close()
+        received = src.recv_into(buffer)
     except socket.error:
-        pass
-    logging.debug(f"[+] Closing connections! [{dst_addr}:{dst_port}]")
+        return False
+    if received == 0:
+        logging.debug("[-] No data received! Breaking...")
+        return False
     try:
-        dst.shutdown(socket.SHUT_RDWR)
-        dst.close()
+        dst.sendall(buffer[:received])
     except socket.error:
-        pass
+        return False
+    return True
+
+
+def kernel_relay(src: socket.socket, dst: socket.socket, pipe: tuple) -> bool:
+    """
+    Send data waiting on the source socket to the destination socket using
+    splice(2) through the given pipe, so the data never has to be copied into
+    user space. Only available on Linux. Returns False once the source socket
+    has been closed.
+    """
+    pipe_r, pipe_w, capacity = pipe
+    try:
+        received = os.splice(
+            src.fileno(),
+            pipe_w,
+            capacity,
+            flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK,
+        )
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    if received == 0:
+        logging.debug("[-] No data received! Breaking...")
+        return False
+
+    # Drain everything that was moved into the pipe to the destination. Do
+    # not pass SPLICE_F_MORE here: it becomes MSG_MORE on the socket, which
+    # holds back small segments and stalls interactive sessions.
+
+    try:
+        while received:
+            received -= os.splice(
+                pipe_r, dst.fileno(), received, flags=os.SPLICE_F_MOVE
+            )
+    except OSError:
+        return False
+    return True
+
+
+def create_relay_pipe() -> tuple:
+    """
+    Create a pipe for use with `kernel_relay`, returning its file descriptors
+    and capacity. The pipe is enlarged so a single splice can move as much
+    data as the socket has buffered, rather than the default 64 KiB; this may
+    fail if the value exceeds /proc/sys/fs/pipe-max-size, in which case the
+    default capacity is kept.
+    """
+    import fcntl
+
+    pipe_r, pipe_w = os.pipe()
+    try:
+        capacity = fcntl.fcntl(pipe_w, fcntl.F_SETPIPE_SZ, SPLICE_PIPE_SIZE)
+    except (AttributeError, OSError):
+        capacity = 0x10000
+    return pipe_r, pipe_w, capacity
+
+
+def _tune_socket(sock: socket.socket) -> None:
+    """
+    Disable Nagle's algorithm so interactive keystrokes are sent immediately
+    and enable keepalives for long idle sessions.
+
+    The socket buffers are only sized if `SOCKET_BUFFER_SIZE` is set, as an
+    explicit size disables the kernel's buffer autotuning.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if SOCKET_BUFFER_SIZE:
+        for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_SIZE)
+    if hasattr(socket, "TCP_QUICKACK"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
 
 
 def create_server_socket(local_port: int = 0) -> socket.socket:
     """
     Attempts to creates a new socket object and binds that to the localhost
     the specified port. The default of 0 indicates a free port will be used.
+    The socket is listening on return, so clients may connect straight away.
     """
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    _tune_socket(server_socket)
     server_socket.bind(("127.0.0.1", local_port))
+    server_socket.listen()
     return server_socket
 
 
@@ -193,47 +400,59 @@ def start_server(
     Main server function that will connect to SpectroServer and initate the
     relayed connection.
 
-    A TX and RX transfer threads are then created, creating a reverse TCP
-    proxy which will listen on the given socket.
+    Data is then relayed between the client and SpectroServer sockets,
+    creating a reverse TCP proxy which will listen on the given socket.
     """
 
-    # Start listening on server socket
     logging.debug("[+] Starting server")
-    server_socket.listen()
 
     # Wait for incoming connection on server socket
     logging.debug("[+] Waiting for incoming connection")
     client_socket, client_addr = server_socket.accept()
-    logging.debug(
-        f"[+] Connection detected from [{client_addr[0]}:{client_addr[1]}]"
-    )
+    _tune_socket(client_socket)
+    logging.debug("[+] Connection detected from [%s:%d]", *client_addr)
 
     # Connect to SpectroServer and issue relay command
     logging.info(
-        f"[+] Connecting to host [{OKCYAN}{device_ip}:{device_port}{ENDC}] "
-        f"through SpectroServer [{OKCYAN}{spectro_ip}:{spectro_port}{ENDC}]"
+        CONNECTING_FMT, device_ip, device_port, spectro_ip, spectro_port
     )
-    relay_cmd = f"relay {device_ip} {str(device_port)}\r\n"
+    relay_cmd = RELAY_CMD_TMPL % (device_ip.encode("ascii"), device_port)
     remote_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    _tune_socket(remote_socket)
     remote_socket.connect((spectro_ip, spectro_port))
-    remote_socket.send(relay_cmd.encode("ascii"))
+    remote_socket.sendall(relay_cmd)
     logging.debug("[+] Tunnel connected! Transferring data...")
 
-    # Create the send and receive threads for transfering data between sockets
-    snd_thread = threading.Thread(
-        target=transfer, args=(remote_socket, client_socket, False)
-    )
-    rcv_thread = threading.Thread(
-        target=transfer, args=(client_socket, remote_socket, True)
-    )
-
-    # Start the transfer threads
-    snd_thread.start()
-    rcv_thread.start()
+    # Relay data between the sockets until either side closes. On Linux the
+    # data is spliced in-kernel, otherwise it is copied through user space.
+    if SPLICE_SUPPORTED:
+        forward = kernel_relay
+        snd_ctx, rcv_ctx = create_relay_pipe(), create_relay_pipe()
+    else:
+        forward = transfer
+        snd_ctx = memoryview(bytearray(0x10000))
+        rcv_ctx = memoryview(bytearray(0x10000))
 
-    # Wait for threads to terminate
-    snd_thread.join()
-    rcv_thread.join()
+    sel = selectors.DefaultSelector()
+    try:
+        sel.register(
+            remote_socket, selectors.EVENT_READ, (client_socket, snd_ctx)
+        )
+        sel.register(
+            client_socket, selectors.EVENT_READ, (remote_socket, rcv_ctx)
+        )
+        connected = True
+        while connected:
+            for key, _ in sel.select():
+                dst, ctx = key.data
+                if not forward(key.fileobj, dst, ctx):
+                    connected = False
+                    break
+    finally:
+        sel.close()
+        if SPLICE_SUPPORTED:
+            for pipe_fd in (*snd_ctx[:2], *rcv_ctx[:2]):
+                os.close(pipe_fd)
 
     # Close down the sockets
     logging.debug("[+] Releasing resources...")
@@ -256,16 +475,6 @@ def start_server(
     logging.debug("[+] Server shutdown!")
 
 
-def console_dispath(platform: str, **kwargs) -> None:
-    """Select console method based on host OS"""
-    console_functions = {
-        "windows": start_putty_session,
-        "linux": start_shell_session,
-    }
-    func = console_functions.get(platform.lower(), start_shell_session)
-    return func(**kwargs)
-
-
 def start_putty_session(
     server_ip: str,
     server_port: int,
@@ -280,7 +489,7 @@ def start_putty_session(
         f"-P {server_port} "
         f"-loghost {device_ip}"
     )
-    logging.debug(f"[+] Starting PuTTY with [{putty_cmd}]")
+    logging.debug("[+] Starting PuTTY with [%s]", putty_cmd)
     Popen(putty_cmd)
 
 
@@ -304,10 +513,23 @@ def start_shell_session(
             f"{input('Username: ')}@{server_ip} -p {server_port}"
         )
 
-    logging.debug(f"[+] Starting session with [{bash_cmd}]")
+    logging.debug("[+] Starting session with [%s]", bash_cmd)
     Popen(bash_cmd, shell=True)
 
 
+CONSOLE_FUNCTIONS = {
+    "windows": start_putty_session,
+    "linux": start_shell_session,
+}
+HOST_OS = platform.system().lower()
+
+
+def console_dispath(platform: str, **kwargs) -> None:
+    """Select console method based on host OS"""
+    func = CONSOLE_FUNCTIONS.get(platform.lower(), start_shell_session)
+    return func(**kwargs)
+
+
 def main() -> None:
     """
     Execution starts here
@@ -336,26 +558,25 @@ def main() -> None:
 
     else:
 
-        devices = spectrum_device_search_by_name(args.host)
+        devices = spectrum_device_search_by_name(
+            args.host, use_cache=args.cache, refresh=args.refresh
+        )
 
         if not devices:
-            print(
-                f'{WARNING}Error: No device with name "{args.host}" '
-                f"found{ENDC}"
-            )
+            print(NOT_FOUND_FMT % args.host)
             sys.exit(1)
 
         if len(devices) > 1:
-            print(f"{WARNING}Mulitple device matches found:{ENDC}")
-            for device, data in sorted(devices.items()):
-                print(f"{device} ({data['ip_addr']})")
+            print(MULTIPLE_MATCHES_MSG)
+            for device in sorted(devices):
+                print(f"{device} ({devices[device]['ip_addr']})")
             if not devices.get(args.host):
-                print(f"{WARNING}No matches found{ENDC}")
+                print(NO_MATCHES_MSG)
                 sys.exit(1)
 
         device = devices.get(args.host, devices[next(iter(devices))])
 
-        logging.info(f"[+] Found device {OKGREEN}{device['name']}{ENDC}")
+        logging.info(FOUND_FMT, device["name"])
         device_ip = device["ip_addr"]
         protocol = (
             "telnet" if device["pfm"] in TELNET_PLATFORMS else args.protocol
@@ -378,40 +599,36 @@ def main() -> None:
     # Create server socket
     server_socket = create_server_socket(args.local_port)
     server_ip, server_port = server_socket.getsockname()
-    logging.debug(f"[+] Created server socket on [{server_ip}:{server_port}]")
-
-    # Start server thread
-    svr_thread = threading.Thread(
-        target=start_server,
-        args=(
-            server_socket,
-            spectro_ip,
-            SPECTROSERVER_PORT,
-            device_ip,
-            device_port,
-        ),
+    logging.debug(
+        "[+] Created server socket on [%s:%d]", server_ip, server_port
     )
-    svr_thread.daemon = True
-    svr_thread.start()
 
     if args.proxy:
         # Just output the local socket information
         logging.info(
-            f"[+] Proxy socket details: {server_ip}:{server_port}. "
-            f"Awaiting connection..."
+            "[+] Proxy socket details: %s:%d. Awaiting connection...",
+            server_ip,
+            server_port,
         )
     else:
         # Launch console session based on local OS
         console_dispath(
-            platform=platform.system(),
+            platform=HOST_OS,
             protocol=protocol,
             server_ip=server_ip,
             server_port=server_port,
             device_ip=device_ip,
         )
 
-    # Wait for server thread to terminate
-    svr_thread.join()
+    # Run the server until the relayed connection closes
+    start_server(
+        server_socket, spectro_ip, SPECTROSERVER_PORT, device_ip, device_port
+    )
+
+
+def _valid_octets(ip_addr: str) -> bool:
+    """Validate each octet of a dotted-quad address is in range"""
+    return all(int(octet) <= 255 for octet in ip_addr.split("."))
 
 
 def _check_ip(ip_addr: str) -> str:
@@ -481,6 +698,17 @@ def _process_args() -> argparse.Namespace:
         help="Just provide a local proxy socket",
         action="store_true",
     )
+    parser.add_argument(
+        "--no-cache",
+        help="Do not use cached Spectrum lookup results",
+        action="store_false",
+        dest="cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        help="Ignore and replace cached Spectrum lookup results",
+        action="store_true",
+    )
     parser.add_argument(
         "-t",
         "--telnet",